@@ -22,6 +22,16 @@
 
 """FastAPI middleware for mocking datetime in requests."""
 
-from fastapi_mock_datetime.middleware import mock_datetime_middleware
+from fastapi_mock_datetime.middleware import (
+    MockDatetimeMiddleware,
+    install_mock_datetime,
+    mock_datetime_middleware,
+    warmup,
+)
 
-__all__ = ("mock_datetime_middleware",)
+__all__ = (
+    "MockDatetimeMiddleware",
+    "install_mock_datetime",
+    "mock_datetime_middleware",
+    "warmup",
+)
@@ -22,12 +22,217 @@
 
 """FastAPI middleware for mocking datetime in requests."""
 
-from collections.abc import Awaitable, Callable
+import json
+import re
+from collections.abc import Awaitable, Callable, Iterable
+from contextvars import ContextVar, Token
 from datetime import datetime, timezone
+from functools import lru_cache
+from types import TracebackType
 
+import anyio
 import time_machine
-from fastapi import Request
-from fastapi.responses import JSONResponse, Response
+from anyio.lowlevel import RunVar
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    from ciso8601 import parse_datetime
+except ImportError:  # pragma: no cover
+    _parse: Callable[[str], datetime] = datetime.fromisoformat
+else:
+    _parse = parse_datetime
+
+_HDR_NAME = b"x-mock-date"
+_UTC = timezone.utc
+# time_machine keeps a single process-wide stack of destinations, so overlapping
+# mocked requests would pop each other's destinations. Mocked requests are serialized.
+# Locks are bound to the event loop they are used in, so each event loop gets its own.
+_travel_lock: RunVar[anyio.Lock] = RunVar("_travel_lock")
+# Lock serializing mocked sub-requests issued while handling the current mocked request
+_nested_travel_lock: ContextVar[anyio.Lock | None] = ContextVar("_nested_travel_lock", default=None)
+_ISO_RE = re.compile(
+    r"\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.(?:\d{3}|\d{6}))?)?(?:Z|[+-]\d{2}:\d{2})?)?",
+    re.ASCII,
+)
+_TZ_OFFSET_LENGTH = len("+HH:MM")
+_DATE_LENGTH = len("YYYY-MM-DD")
+
+
+@lru_cache(maxsize=1024)
+def _parse_mock(header: str) -> datetime:
+    """Parse X-Mock-Date header value into timezone-aware datetime.
+
+    Naive values are treated as UTC. Results are cached because the same
+    header value usually repeats across requests of a test suite.
+
+    Raises:
+        ValueError: If header value is not a valid ISO 8601 datetime.
+
+    """
+    if header.endswith("Z"):
+        return _parse(header[:-1] + "+00:00")
+    if _has_offset(header):
+        return _parse(header)
+    if _is_naive_datetime(header):
+        return _parse(header + "+00:00")
+    mock_time = _parse(header)
+    if mock_time.tzinfo is None:
+        mock_time = mock_time.replace(tzinfo=_UTC)
+    return mock_time
+
+
+@lru_cache(maxsize=1024)
+def _mock_travel(mock_time: datetime) -> time_machine.travel:
+    """Time travel to mocked datetime.
+
+    travel objects keep no state between start and stop, so one instance per
+    destination is reused instead of normalizing the destination on every request.
+    """
+    return time_machine.travel(mock_time, tick=False)
+
+
+def _root_travel_lock() -> anyio.Lock:
+    """Lock serializing top-level mocked requests in the running event loop."""
+    try:
+        return _travel_lock.get()
+    except LookupError:
+        lock = anyio.Lock()
+        _travel_lock.set(lock)
+        return lock
+
+
+class _ExclusiveTravel:
+    """Time travel to mocked datetime, one mocked request at a time.
+
+    Mocked sub-requests issued while handling a mocked request (e.g. in-process
+    calls through httpx.ASGITransport) can't wait for the lock held by the outer
+    request, so each mocked request gives its sub-requests a lock of their own.
+    Sibling sub-requests are serialized on it, nested ones travel on top of the outer one.
+
+    Written as a class rather than an asynccontextmanager, as mypyc can't compile async generators.
+    """
+
+    _token: Token[anyio.Lock | None]
+
+    def __init__(self, mock_time: datetime) -> None:
+        """Ctor.
+
+        Args:
+            mock_time: Mocked datetime.
+
+        """
+        self._travel = _mock_travel(mock_time)
+        self._lock = _nested_travel_lock.get() or _root_travel_lock()
+
+    async def __aenter__(self) -> None:
+        """Wait for the lock and start time travel."""
+        await self._lock.acquire()
+        self._token = _nested_travel_lock.set(anyio.Lock())
+        self._travel.start()
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Stop time travel and release the lock."""
+        self._travel.stop()
+        _nested_travel_lock.reset(self._token)
+        self._lock.release()
+
+
+def _is_naive_datetime(header: str) -> bool:
+    """Check that header value has time part without UTC offset.
+
+    Date-only values are excluded: fromisoformat ignores offset appended to a bare date.
+    """
+    time_part = header[_DATE_LENGTH:]
+    return bool(time_part) and "+" not in time_part and "-" not in time_part
+
+
+def _has_offset(header: str) -> bool:
+    """Check that header value ends with ±HH:MM offset."""
+    offset = header[-_TZ_OFFSET_LENGTH:]
+    return len(offset) == _TZ_OFFSET_LENGTH and offset[0] in "+-" and offset[3] == ":"
+
+
+def _mock_date_header(scope: Scope, header_key: bytes = _HDR_NAME) -> str | None:
+    """X-Mock-Date header value taken straight from raw ASGI headers.
+
+    Args:
+        scope: ASGI connection scope.
+        header_key: Lowercased header name, as ASGI servers pass header names in lowercase.
+
+    """
+    headers: list[tuple[bytes, bytes]] = scope["headers"]
+    for name, value in headers:
+        if name == header_key:
+            return value.decode("latin-1")
+    return None
+
+
+def _mock_time(header: str) -> datetime | None:
+    """Mocked datetime from X-Mock-Date header value, None if value is invalid.
+
+    Values not shaped like ISO 8601 are rejected by regex without going through
+    parser exceptions. The parser still rejects out-of-range fields, e.g. month 13.
+    """
+    if not _ISO_RE.fullmatch(header):
+        return None
+    try:
+        return _parse_mock(header)
+    except ValueError:
+        return None
+
+
+def _error_envelope(header_name: str) -> tuple[bytes, bytes]:
+    """422 response body for header, split around the "input" value.
+
+    Body is rendered once with "input": null, so only the input value
+    has to be encoded per request.
+    """
+    body = json.dumps(
+        {
+            "detail": [
+                {
+                    "type": "value_error",
+                    "loc": ("header", header_name),
+                    "msg": "Invalid datetime format. Use ISO format: YYYY-MM-DDTHH:MM:SS[±HH:MM]",
+                    "input": None,
+                },
+            ],
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    prefix, suffix = body.rsplit("null", 1)
+    return prefix.encode(), suffix.encode()
+
+
+_ERR_ENVELOPE = _error_envelope(_HDR_NAME.decode("latin-1"))
+
+
+@lru_cache(maxsize=256)
+def _invalid_body(header: str, envelope: tuple[bytes, bytes]) -> bytes:
+    """422 response body, shared between requests repeating the same invalid value."""
+    prefix, suffix = envelope
+    return prefix + json.dumps(header, ensure_ascii=False).encode() + suffix
+
+
+def _invalid_response(header: str, envelope: tuple[bytes, bytes] = _ERR_ENVELOPE) -> Response:
+    """422 response for invalid X-Mock-Date header value.
+
+    Response is built per request: its headers are mutable, so callers
+    may change them and a shared instance would leak those changes.
+    """
+    return Response(
+        content=_invalid_body(header, envelope),
+        status_code=422,
+        media_type="application/json",
+    )
 
 
 async def mock_datetime_middleware(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
@@ -50,26 +255,94 @@ async def mock_datetime_middleware(request: Request, call_next: Callable[[Reques
         >>> response = client.get("/api/endpoint", headers=headers)
 
     """
-    mock_time_header = request.headers.get("X-Mock-Date")
+    mock_time_header = _mock_date_header(request.scope)
     if not mock_time_header:
         return await call_next(request)
-    try:
-        mock_time = datetime.fromisoformat(mock_time_header)
-        if mock_time.tzinfo is None:
-            mock_time = mock_time.replace(tzinfo=timezone.utc)
-        with time_machine.travel(mock_time, tick=False):
-            return await call_next(request)
-    except ValueError:
-        return JSONResponse(
-            status_code=422,
-            content={
-                "detail": [
-                    {
-                        "type": "value_error",
-                        "loc": ["header", "x-mock-date"],
-                        "msg": "Invalid datetime format. Use ISO format: YYYY-MM-DDTHH:MM:SS[±HH:MM]",
-                        "input": mock_time_header,
-                    },
-                ],
-            },
-        )
+    mock_time = _mock_time(mock_time_header)
+    if mock_time is None:
+        return _invalid_response(mock_time_header)
+    async with _ExclusiveTravel(mock_time):
+        return await call_next(request)
+
+
+class MockDatetimeMiddleware:
+    """ASGI middleware for mocking the current datetime in request processing.
+
+    Works like `mock_datetime_middleware`, but as a pure ASGI middleware, so it
+    avoids the per-request overhead of Starlette's BaseHTTPMiddleware wrapper.
+
+    Example:
+        >>> app = FastAPI()
+        >>> app.add_middleware(MockDatetimeMiddleware)
+        >>> app.add_middleware(MockDatetimeMiddleware, header_name="X-Frozen-Time")
+
+    """
+
+    def __init__(self, app: ASGIApp, header_name: str = "X-Mock-Date") -> None:
+        """Ctor.
+
+        Header lookup key and error body are prepared here once instead of on every request.
+
+        Args:
+            app: The next ASGI application in the chain.
+            header_name: Name of header carrying the mocked datetime.
+
+        """
+        self.app = app
+        self._header_key = header_name.lower().encode("latin-1")
+        self._envelope = _error_envelope(header_name.lower())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Process ASGI request."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        mock_time_header = _mock_date_header(scope, self._header_key)
+        if not mock_time_header:
+            await self.app(scope, receive, send)
+            return
+        mock_time = _mock_time(mock_time_header)
+        if mock_time is None:
+            await _invalid_response(mock_time_header, self._envelope)(scope, receive, send)
+            return
+        async with _ExclusiveTravel(mock_time):
+            await self.app(scope, receive, send)
+
+
+def install_mock_datetime(app: FastAPI, enabled: bool = True) -> None:
+    """Register mock datetime middleware in FastAPI application.
+
+    Middleware is added only when enabled, so production deployments can skip it
+    entirely and don't pay for an extra middleware layer on every request.
+
+    Args:
+        app: FastAPI application.
+        enabled: Whether to register middleware.
+
+    Example:
+        >>> install_mock_datetime(app, enabled=os.environ.get("MOCK_DATETIME_ENABLED") == "1")
+
+    """
+    if enabled:
+        app.add_middleware(MockDatetimeMiddleware)
+
+
+def warmup(headers: Iterable[str]) -> None:
+    """Pre-populate caches with known X-Mock-Date header values.
+
+    Useful for test suites with a small known set of mocked dates, so first
+    requests don't pay for parsing.
+
+    Args:
+        headers: X-Mock-Date header values.
+
+    Raises:
+        ValueError: If header value is not a valid ISO 8601 datetime.
+
+    """
+    for header in headers:
+        mock_time = _mock_time(header)
+        if mock_time is None:
+            msg = "Invalid datetime format: {0!r}".format(header)
+            raise ValueError(msg)
+        _mock_travel(mock_time)
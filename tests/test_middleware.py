@@ -22,27 +22,57 @@
 
 """Tests for FastAPI mock datetime middleware."""
 
-from collections.abc import Awaitable, Callable
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
+from functools import partial
 
+import anyio
+import ciso8601
+import httpx
 import pytest
 import time_machine
 from fastapi import FastAPI, Request
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response
 from fastapi.testclient import TestClient
 
-from fastapi_mock_datetime.middleware import mock_datetime_middleware
+from fastapi_mock_datetime.middleware import (
+    MockDatetimeMiddleware,
+    _mock_travel,
+    _parse_mock,
+    install_mock_datetime,
+    mock_datetime_middleware,
+    warmup,
+)
+
+
+@pytest.fixture(params=["fromisoformat", "ciso8601"])
+def parser(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    """Run header parsing tests against both supported ISO 8601 parsers."""
+    parsers = {
+        "fromisoformat": datetime.fromisoformat,
+        "ciso8601": ciso8601.parse_datetime,
+    }
+    monkeypatch.setattr("fastapi_mock_datetime.middleware._parse", parsers[request.param])
+    _parse_mock.cache_clear()
+    yield
+    _parse_mock.cache_clear()
 
 
-@pytest.fixture
-def app() -> FastAPI:
-    """Fastapi app for test."""
-    app = FastAPI()
+def install_http_middleware(app: FastAPI) -> None:
+    """Register mock_datetime_middleware as http middleware."""
 
     @app.middleware("http")
     async def mock_middleware(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
         return await mock_datetime_middleware(request, call_next)
 
+
+def create_app(install: Callable[[FastAPI], None]) -> FastAPI:
+    """Fastapi app for test with mock datetime middleware registered by install."""
+    app = FastAPI()
+    install(app)
+
     @app.get("/")
     async def root() -> dict[str, str]:
         """Root endpoint."""
@@ -53,9 +83,28 @@ def app() -> FastAPI:
         """Test endpoint."""
         return {"message": "test"}
 
+    @app.get("/slow")
+    async def slow() -> dict[str, str]:
+        """Endpoint yielding to event loop before reading time."""
+        await asyncio.sleep(0)
+        return {"current_time": datetime.now(timezone.utc).isoformat()}
+
     return app
 
 
+def asgi_client(app: FastAPI) -> httpx.AsyncClient:
+    """Client sending requests to app in-process."""
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.fixture(params=["http", "asgi"])
+def app(request: pytest.FixtureRequest) -> FastAPI:
+    """Fastapi app for test."""
+    if request.param == "asgi":
+        return create_app(lambda app: app.add_middleware(MockDatetimeMiddleware))
+    return create_app(install_http_middleware)
+
+
 @pytest.fixture
 def client(app: FastAPI) -> TestClient:
     """Test client."""
@@ -73,6 +122,7 @@ def test_without_mock_header(client: TestClient) -> None:
     )
 
 
+@pytest.mark.usefixtures("parser")
 def test_with_valid_mock_header_utc(client: TestClient) -> None:
     """Test request with valid UTC X-Mock-Date header returns mocked time."""
     mock_time = "2023-10-05T12:00:00+00:00"
@@ -83,6 +133,7 @@ def test_with_valid_mock_header_utc(client: TestClient) -> None:
     assert response.json()["current_time"] == mock_time
 
 
+@pytest.mark.usefixtures("parser")
 def test_with_valid_mock_header_naive(client: TestClient) -> None:
     """Test request with naive datetime header converts to UTC."""
     mock_time_naive = "2023-10-05T12:00:00"
@@ -94,6 +145,57 @@ def test_with_valid_mock_header_naive(client: TestClient) -> None:
     assert response.json()["current_time"] == expected_time_utc
 
 
+@pytest.mark.usefixtures("parser")
+@pytest.mark.parametrize(
+    ("mock_time", "expected_time_utc"),
+    [
+        ("2023-10-05T12:00:00Z", "2023-10-05T12:00:00+00:00"),
+        ("2023-10-05T12:00:00+05:00", "2023-10-05T07:00:00+00:00"),
+        ("2023-10-05T12:00:00-05:00", "2023-10-05T17:00:00+00:00"),
+    ],
+)
+def test_with_valid_mock_header_offset(client: TestClient, mock_time: str, expected_time_utc: str) -> None:
+    """Test request with UTC designator or offset in X-Mock-Date header."""
+    response = client.get("/", headers={"X-Mock-Date": mock_time})
+
+    assert response.status_code == 200
+    assert response.json()["current_time"] == expected_time_utc
+
+
+@pytest.mark.usefixtures("parser")
+def test_with_valid_mock_header_date_only(client: TestClient) -> None:
+    """Test request with date-only header mocks UTC midnight."""
+    response = client.get("/", headers={"X-Mock-Date": "2023-10-05"})
+
+    assert response.status_code == 200
+    assert response.json()["current_time"] == "2023-10-05T00:00:00+00:00"
+
+
+@pytest.mark.usefixtures("parser")
+@pytest.mark.parametrize(
+    ("mock_time", "expected_time_utc"),
+    [
+        ("2023-10-05T12:00:00.123", "2023-10-05T12:00:00.123000+00:00"),
+        ("2023-10-05T12:00:00.123456+05:00", "2023-10-05T07:00:00.123456+00:00"),
+    ],
+)
+def test_with_valid_mock_header_fraction(client: TestClient, mock_time: str, expected_time_utc: str) -> None:
+    """Test request with millisecond or microsecond fraction in X-Mock-Date header."""
+    response = client.get("/", headers={"X-Mock-Date": mock_time})
+
+    assert response.status_code == 200
+    assert response.json()["current_time"] == expected_time_utc
+
+
+@pytest.mark.parametrize("mock_time", ["2023-10-05T12:00:00.1", "2023-10-05T12:00:00.1234567Z"])
+def test_with_unsupported_fraction_mock_header(client: TestClient, mock_time: str) -> None:
+    """Test request with fraction other than milliseconds or microseconds returns 422 error."""
+    response = client.get("/", headers={"X-Mock-Date": mock_time})
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["input"] == mock_time
+
+
 def test_with_invalid_mock_header(client: TestClient) -> None:
     """Test request with invalid X-Mock-Date header returns 422 error."""
     invalid_time = "invalid-date-format"
@@ -138,6 +240,114 @@ def test_different_endpoints_with_mock_time(client: TestClient) -> None:
     assert response2.json()["message"] == "test"
 
 
+def test_asgi_middleware_passes_lifespan() -> None:
+    """Test ASGI middleware passes non-HTTP scopes to the application."""
+    events = []
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        events.append("startup")
+        yield
+        events.append("shutdown")
+
+    app = FastAPI(lifespan=lifespan)
+    app.add_middleware(MockDatetimeMiddleware)
+
+    with TestClient(app):
+        pass
+
+    assert events == ["startup", "shutdown"]
+
+
+def test_custom_header_name() -> None:
+    """Test ASGI middleware reading mocked time from custom header."""
+    client = TestClient(create_app(lambda app: app.add_middleware(MockDatetimeMiddleware, header_name="X-Frozen-Time")))
+    mock_time = "2023-10-05T12:00:00+00:00"
+
+    response = client.get("/", headers={"X-Frozen-Time": mock_time})
+    invalid_response = client.get("/", headers={"X-Frozen-Time": "invalid-date-format"})
+
+    assert response.json()["current_time"] == mock_time
+    assert invalid_response.status_code == 422
+    assert invalid_response.json()["detail"][0]["loc"] == ["header", "x-frozen-time"]
+
+
+async def test_concurrent_mocked_requests(app: FastAPI) -> None:
+    """Test that overlapping requests keep their own mocked time."""
+    mock_times = [
+        "2023-10-05T12:00:00+00:00",
+        "2024-01-01T00:00:00+00:00",
+        "2025-06-15T08:30:00+00:00",
+    ]
+    async with asgi_client(app) as client:
+        responses = await asyncio.gather(
+            *(client.get("/slow", headers={"X-Mock-Date": mock_time}) for mock_time in mock_times),
+        )
+
+    assert [response.json()["current_time"] for response in responses] == mock_times
+
+
+async def test_nested_mocked_request(app: FastAPI) -> None:
+    """Test mocked request making in-process mocked sub-request to the same app."""
+
+    @app.get("/nested")
+    async def nested() -> dict[str, str]:
+        """Endpoint calling root endpoint with another mocked time."""
+        async with asgi_client(app) as client:
+            inner = await client.get("/", headers={"X-Mock-Date": "2024-01-01T00:00:00+00:00"})
+        return {
+            "inner_time": inner.json()["current_time"],
+            "current_time": datetime.now(timezone.utc).isoformat(),
+        }
+
+    async with asgi_client(app) as client:
+        response = await client.get("/nested", headers={"X-Mock-Date": "2023-10-05T12:00:00+00:00"})
+
+    assert response.json() == {
+        "inner_time": "2024-01-01T00:00:00+00:00",
+        "current_time": "2023-10-05T12:00:00+00:00",
+    }
+
+
+async def test_concurrent_nested_mocked_requests(app: FastAPI) -> None:
+    """Test that sibling mocked sub-requests keep their own mocked time."""
+
+    @app.get("/fanout")
+    async def fanout() -> dict[str, object]:
+        """Endpoint calling slow endpoint concurrently with different mocked times."""
+        async with asgi_client(app) as client:
+            inner = await asyncio.gather(
+                client.get("/slow", headers={"X-Mock-Date": "2020-01-01"}),
+                client.get("/slow", headers={"X-Mock-Date": "2021-01-01"}),
+            )
+        return {
+            "inner_times": [response.json()["current_time"] for response in inner],
+            "current_time": datetime.now(timezone.utc).isoformat(),
+        }
+
+    async with asgi_client(app) as client:
+        response = await client.get("/fanout", headers={"X-Mock-Date": "2023-10-05T12:00:00+00:00"})
+
+    assert response.json() == {
+        "inner_times": ["2020-01-01T00:00:00+00:00", "2021-01-01T00:00:00+00:00"],
+        "current_time": "2023-10-05T12:00:00+00:00",
+    }
+
+
+def test_mocked_requests_on_different_backends(app: FastAPI) -> None:
+    """Test mocked requests in event loops of different async backends in one process."""
+    mock_time = "2023-10-05T12:00:00+00:00"
+
+    async def mocked_request() -> str:
+        async with asgi_client(app) as client:
+            response = await client.get("/", headers={"X-Mock-Date": mock_time})
+        return str(response.json()["current_time"])
+
+    current_times = [anyio.run(mocked_request, backend=backend) for backend in ("asyncio", "trio", "asyncio")]
+
+    assert current_times == [mock_time] * 3
+
+
 def test_time_travel_isolation() -> None:
     """Test that time_machine travel context properly isolates time mocking."""
     original_time_before = datetime.now(timezone.utc)
@@ -150,3 +360,106 @@ def test_time_travel_isolation() -> None:
     original_time_after = datetime.now(timezone.utc)
     time_diff = (original_time_after - original_time_before).total_seconds()
     assert time_diff < 1
+
+
+def test_invalid_mock_header_body(client: TestClient) -> None:
+    """Test error body is byte-identical to JSONResponse rendering."""
+    response = client.get("/", headers={"X-Mock-Date": "invalid-date-format"})
+
+    assert response.content == (
+        JSONResponse(
+            status_code=422,
+            content={
+                "detail": [
+                    {
+                        "type": "value_error",
+                        "loc": ["header", "x-mock-date"],
+                        "msg": "Invalid datetime format. Use ISO format: YYYY-MM-DDTHH:MM:SS[±HH:MM]",
+                        "input": "invalid-date-format",
+                    },
+                ],
+            },
+        ).body
+    )
+
+
+def test_invalid_mock_header_responses_are_not_shared() -> None:
+    """Test that headers added to one 422 response don't leak into later ones."""
+    app = FastAPI()
+    counter = iter(range(1, 4))
+
+    @app.middleware("http")
+    async def trace_middleware(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+        response = await mock_datetime_middleware(request, call_next)
+        response.headers.append("X-Trace", str(next(counter)))
+        return response
+
+    client = TestClient(app)
+
+    traces = [client.get("/", headers={"X-Mock-Date": "garbage"}).headers["X-Trace"] for _ in range(3)]
+
+    assert traces == ["1", "2", "3"]
+
+
+def test_invalid_mock_header_is_escaped(client: TestClient) -> None:
+    """Test that invalid X-Mock-Date value is JSON-escaped in error response."""
+    invalid_time = 'bad"date\\format'
+
+    response = client.get("/", headers={"X-Mock-Date": invalid_time})
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["input"] == invalid_time
+    assert "±".encode() in response.content
+
+
+@pytest.mark.usefixtures("parser")
+def test_with_out_of_range_mock_header(client: TestClient) -> None:
+    """Test request with well-formed but impossible X-Mock-Date returns 422 error."""
+    response = client.get("/", headers={"X-Mock-Date": "2023-13-05T12:00:00"})
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["input"] == "2023-13-05T12:00:00"
+
+
+def test_with_too_long_mock_header(client: TestClient) -> None:
+    """Test request with overlong X-Mock-Date header is rejected before parsing."""
+    invalid_time = "2023-10-05T12:00:00+00:00" + "0" * 20
+
+    response = client.get("/", headers={"X-Mock-Date": invalid_time})
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["input"] == invalid_time
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_install_mock_datetime(enabled: bool) -> None:
+    """Test middleware is registered only when enabled."""
+    mock_time = "2023-10-05T12:00:00+00:00"
+    client = TestClient(create_app(partial(install_mock_datetime, enabled=enabled)))
+
+    response = client.get("/", headers={"X-Mock-Date": mock_time})
+
+    assert response.status_code == 200
+    assert (response.json()["current_time"] == mock_time) is enabled
+
+
+@pytest.mark.usefixtures("parser")
+def test_warmup(client: TestClient) -> None:
+    """Test that warmed up X-Mock-Date values are served from caches."""
+    _mock_travel.cache_clear()
+    warmup(["2023-10-05T12:00:00Z", "2023-10-05T12:00:00"])
+    parse_info = _parse_mock.cache_info()
+    travel_info = _mock_travel.cache_info()
+
+    response = client.get("/", headers={"X-Mock-Date": "2023-10-05T12:00:00"})
+
+    assert response.json()["current_time"] == "2023-10-05T12:00:00+00:00"
+    assert (parse_info.currsize, travel_info.currsize) == (2, 1)
+    assert _parse_mock.cache_info() == parse_info._replace(hits=parse_info.hits + 1)
+    assert _mock_travel.cache_info() == travel_info._replace(hits=travel_info.hits + 1)
+
+
+def test_warmup_invalid_header() -> None:
+    """Test that warmup rejects invalid X-Mock-Date values."""
+    with pytest.raises(ValueError, match="invalid-date-format"):
+        warmup(["invalid-date-format"])